@@ -1,7 +1,10 @@
-import dbus
 import subprocess
 from pathlib import Path
-import sys
+from concurrent.futures import ThreadPoolExecutor
+
+def _run_probe(command):
+    """Run a diagnostic command and capture its output"""
+    return subprocess.run(command, capture_output=True, text=True)
 
 def diagnose_bluetooth_stack():
     """
@@ -17,29 +20,20 @@ def diagnose_bluetooth_stack():
     }
 
     try:
-        # Check BlueZ service status
-        bluez_status = subprocess.run(
-            ['systemctl', 'status', 'bluetooth'],
-            capture_output=True,
-            text=True
-        )
-        results['bluez_status'] = 'running' in bluez_status.stdout.lower()
-
-        # Check D-Bus service
-        dbus_status = subprocess.run(
-            ['systemctl', 'status', 'dbus'],
-            capture_output=True,
-            text=True
-        )
-        results['dbus_status'] = 'running' in dbus_status.stdout.lower()
-
-        # Check for bluetooth group membership
-        groups_output = subprocess.run(
-            ['groups'],
-            capture_output=True,
-            text=True
-        )
-        results['permissions'] = 'bluetooth' in groups_output.stdout
+        # The probes are independent, so run them concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            # Check BlueZ service status
+            bluez_status = executor.submit(_run_probe, ['systemctl', 'status', 'bluetooth'])
+
+            # Check D-Bus service
+            dbus_status = executor.submit(_run_probe, ['systemctl', 'status', 'dbus'])
+
+            # Check for bluetooth group membership
+            groups_output = executor.submit(_run_probe, ['groups'])
+
+        results['bluez_status'] = 'running' in bluez_status.result().stdout.lower()
+        results['dbus_status'] = 'running' in dbus_status.result().stdout.lower()
+        results['permissions'] = 'bluetooth' in groups_output.result().stdout
 
         # Look for relevant service files
         service_path = Path('/usr/share/dbus-1/services/')
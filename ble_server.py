@@ -5,10 +5,11 @@ import dbus.exceptions
 import dbus.mainloop.glib
 import dbus.service
 import logging
+import signal
+import socket
 import sys
-import os
-from datetime import datetime
 from gi.repository import GLib
+from logger_config import logger
 
 # Constants
 BLUEZ_SERVICE_NAME = 'org.bluez'
@@ -19,16 +20,15 @@ GATT_SERVICE_IFACE = 'org.bluez.GattService1'
 GATT_CHRC_IFACE = 'org.bluez.GattCharacteristic1'
 LE_ADVERTISING_MANAGER_IFACE = 'org.bluez.LEAdvertisingManager1'
 BASE_PATH = '/org/bluez/pigattserver'
-
-# Set up logging
-logger = logging.getLogger('ble_server')
+APP_PATH = dbus.ObjectPath(BASE_PATH)
+VALUE_CHANGED_DELAY_MS = 5
+DEFAULT_ATT_MTU = 23
+SHUTDOWN_TIMEOUT_MS = 2000
+EMPTY_OPTIONS = dbus.Dictionary({}, signature='sv')
+
+# Set up logging; records go through logger_config's queue so D-Bus
+# handlers never block on stdout
 logger.setLevel(logging.DEBUG)
-handler = logging.StreamHandler()
-handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - [%(levelname)s] - %(message)s', 
-                            datefmt='%Y-%m-%d %H:%M:%S')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
 class InvalidArgsException(dbus.exceptions.DBusException):
     _dbus_error_name = 'org.freedesktop.DBus.Error.InvalidArgs'
@@ -36,6 +36,9 @@ class InvalidArgsException(dbus.exceptions.DBusException):
 class NotSupportedException(dbus.exceptions.DBusException):
     _dbus_error_name = 'org.bluez.Error.NotSupported'
 
+class FailedException(dbus.exceptions.DBusException):
+    _dbus_error_name = 'org.bluez.Error.Failed'
+
 class BLEService(dbus.service.Object):
     """Base BLE service class with D-Bus support"""
     
@@ -44,35 +47,45 @@ class BLEService(dbus.service.Object):
         self.uuid = uuid
         self.primary = primary
         self.characteristics = []
+        # Immutable snapshot handed to callers; the property array stays private
+        self._characteristic_paths = ()
+        # Set by Application.add_service so later additions reach its cache
+        self.application = None
         self.path = f'{BASE_PATH}/service{index}'
-        logger.debug(f'Service path: {self.path}')
+        self._object_path = dbus.ObjectPath(self.path)
+        logger.debug('Service path: %s', self.path)
         super().__init__(bus, self.path)
-
-    def get_properties(self):
-        """Get the D-Bus properties for this service"""
-        return {
+        # Built once; add_characteristic keeps the path array up to date
+        self._properties = {
             GATT_SERVICE_IFACE: {
                 'UUID': self.uuid,
                 'Primary': self.primary,
-                'Characteristics': dbus.Array(
-                    self.get_characteristic_paths(),
-                    signature='o')
+                'Characteristics': dbus.Array([], signature='o')
             }
         }
 
+    def get_properties(self):
+        """Get the D-Bus properties for this service"""
+        return self._properties
+
     def get_path(self):
         """Get the D-Bus object path"""
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def get_characteristic_paths(self):
         """Get the D-Bus object paths of all characteristics"""
-        return [char.get_path() for char in self.characteristics]
+        return self._characteristic_paths
 
     def add_characteristic(self, characteristic):
         """Add a characteristic to this service"""
         logger.debug('Adding characteristic')
         self.characteristics.append(characteristic)
         characteristic.service = self
+        self._properties[GATT_SERVICE_IFACE]['Characteristics'].append(
+            characteristic.get_path())
+        self._characteristic_paths += (characteristic.get_path(),)
+        if self.application is not None:
+            self.application.object_added(characteristic)
         logger.debug('Characteristic added')
 
     @dbus.service.method(DBUS_PROP_IFACE,
@@ -87,20 +100,25 @@ class BLEService(dbus.service.Object):
 class BLECharacteristic(dbus.service.Object):
     """Base BLE characteristic class with D-Bus support"""
     
-    def __init__(self, bus, index, uuid, flags, service):
+    def __init__(self, bus, index, uuid, flags, service,
+                 acquire_notify=False, acquire_write=False):
         self.bus = bus
         self.uuid = uuid
         self.service = service
         self.flags = flags
         self.notifying = False
-        self.value = dbus.Array([], signature='y')
+        self.value = dbus.ByteArray(b'')
+        self._pending_change_source = None
+        self._notify_sock = None
+        self._notify_mtu = DEFAULT_ATT_MTU
+        self._write_sock = None
+        self._write_mtu = DEFAULT_ATT_MTU
         self.path = f'{service.path}/char{index}'
-        logger.debug(f'Characteristic path: {self.path}')
+        self._object_path = dbus.ObjectPath(self.path)
+        logger.debug('Characteristic path: %s', self.path)
         super().__init__(bus, self.path)
-
-    def get_properties(self):
-        """Get the D-Bus properties for this characteristic"""
-        return {
+        # Built once; Value and Notifying are updated in place when they change
+        self._properties = {
             GATT_CHRC_IFACE: {
                 'Service': self.service.get_path(),
                 'UUID': self.uuid,
@@ -109,10 +127,22 @@ class BLECharacteristic(dbus.service.Object):
                 'Notifying': dbus.Boolean(self.notifying)
             }
         }
+        if acquire_notify and ('notify' in flags or 'indicate' in flags):
+            # Advertising NotifyAcquired makes BlueZ use AcquireNotify instead
+            # of StartNotify, so subclasses opt in explicitly
+            self._properties[GATT_CHRC_IFACE]['NotifyAcquired'] = dbus.Boolean(False)
+        if acquire_write and 'write-without-response' in flags:
+            # Advertising WriteAcquired makes BlueZ use AcquireWrite instead
+            # of WriteValue, so subclasses opt in explicitly
+            self._properties[GATT_CHRC_IFACE]['WriteAcquired'] = dbus.Boolean(False)
+
+    def get_properties(self):
+        """Get the D-Bus properties for this characteristic"""
+        return self._properties
 
     def get_path(self):
         """Get the D-Bus object path"""
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     @dbus.service.method(DBUS_PROP_IFACE,
                         in_signature='s',
@@ -135,14 +165,58 @@ class BLECharacteristic(dbus.service.Object):
                         in_signature='aya{sv}')
     def WriteValue(self, value, options):
         """Write the characteristic value"""
-        logger.debug(f'WriteValue called with: {bytes(value)}')
-        self.value = value
+        value = bytes(value)
+        logger.debug('WriteValue called with: %s', value)
+        self._store_value(value)
+
+    def _store_value(self, value):
+        if value == self.value:
+            return
+        self.value = dbus.ByteArray(value)
+        self._properties[GATT_CHRC_IFACE]['Value'] = self.value
+        self.schedule_value_changed()
+
+    def schedule_value_changed(self):
+        """Emit a single PropertiesChanged for Value after a short debounce window"""
+        if not self.notifying:
+            return
+        if self._pending_change_source is None:
+            self._pending_change_source = GLib.timeout_add(
+                VALUE_CHANGED_DELAY_MS, self._emit_value_changed)
+
+    def _cancel_value_changed(self):
+        """Drop a pending Value signal once nobody is subscribed anymore"""
+        if self._pending_change_source is not None:
+            GLib.source_remove(self._pending_change_source)
+            self._pending_change_source = None
+
+    def _emit_value_changed(self):
+        self._pending_change_source = None
+        if not self.notifying:
+            return False
+        if self._notify_sock is not None:
+            # A notification carries at most MTU - 3 bytes (opcode + handle)
+            payload = self.value[:self._notify_mtu - 3]
+            try:
+                self._notify_sock.send(payload)
+            except OSError as e:
+                logger.error(f'Failed to send notification: {str(e)}')
+        else:
+            self.PropertiesChanged(GATT_CHRC_IFACE, {'Value': self.value}, [])
+        return False
+
+    @dbus.service.signal(DBUS_PROP_IFACE,
+                        signature='sa{sv}as')
+    def PropertiesChanged(self, interface, changed, invalidated):
+        """Signal emitted when characteristic properties change"""
+        pass
 
     @dbus.service.method(GATT_CHRC_IFACE)
     def StartNotify(self):
         """Start notifications for this characteristic"""
         if not self.notifying:
             self.notifying = True
+            self._properties[GATT_CHRC_IFACE]['Notifying'] = dbus.Boolean(True)
             logger.debug('Notifications enabled')
 
     @dbus.service.method(GATT_CHRC_IFACE)
@@ -150,8 +224,93 @@ class BLECharacteristic(dbus.service.Object):
         """Stop notifications for this characteristic"""
         if self.notifying:
             self.notifying = False
+            self._properties[GATT_CHRC_IFACE]['Notifying'] = dbus.Boolean(False)
+            self._cancel_value_changed()
             logger.debug('Notifications disabled')
 
+    @dbus.service.method(GATT_CHRC_IFACE,
+                        in_signature='a{sv}',
+                        out_signature='hq')
+    def AcquireNotify(self, options):
+        """Hand BlueZ a socket that carries notifications instead of D-Bus signals"""
+        if 'NotifyAcquired' not in self._properties[GATT_CHRC_IFACE]:
+            raise NotSupportedException()
+        if self._notify_sock is not None:
+            raise FailedException('Notify already acquired')
+
+        mtu = int(options.get('mtu', DEFAULT_ATT_MTU))
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        ours.setblocking(False)
+        self._notify_sock = ours
+        self._notify_mtu = mtu
+        # BlueZ closes its end when the client unsubscribes
+        GLib.io_add_watch(ours.fileno(), GLib.PRIORITY_DEFAULT,
+                          GLib.IO_HUP | GLib.IO_ERR, self._on_notify_closed)
+
+        self.notifying = True
+        self._properties[GATT_CHRC_IFACE]['Notifying'] = dbus.Boolean(True)
+        self._properties[GATT_CHRC_IFACE]['NotifyAcquired'] = dbus.Boolean(True)
+        logger.debug('Notifications acquired with MTU %s', mtu)
+
+        fd = dbus.types.UnixFd(theirs)
+        theirs.close()
+        return fd, dbus.UInt16(mtu)
+
+    def _on_notify_closed(self, fd, condition):
+        self._notify_sock.close()
+        self._notify_sock = None
+        self.notifying = False
+        self._properties[GATT_CHRC_IFACE]['Notifying'] = dbus.Boolean(False)
+        self._cancel_value_changed()
+        self._properties[GATT_CHRC_IFACE]['NotifyAcquired'] = dbus.Boolean(False)
+        logger.debug('Acquired notifications released')
+        return False
+
+    @dbus.service.method(GATT_CHRC_IFACE,
+                        in_signature='a{sv}',
+                        out_signature='hq')
+    def AcquireWrite(self, options):
+        """Hand BlueZ a socket that carries write-without-response data instead of WriteValue calls"""
+        if 'WriteAcquired' not in self._properties[GATT_CHRC_IFACE]:
+            raise NotSupportedException()
+        if self._write_sock is not None:
+            raise FailedException('Write already acquired')
+
+        mtu = int(options.get('mtu', DEFAULT_ATT_MTU))
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        ours.setblocking(False)
+        self._write_sock = ours
+        self._write_mtu = mtu
+        GLib.io_add_watch(ours.fileno(), GLib.PRIORITY_DEFAULT,
+                          GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._on_write_ready)
+
+        self._properties[GATT_CHRC_IFACE]['WriteAcquired'] = dbus.Boolean(True)
+        logger.debug('Write acquired with MTU %s', mtu)
+
+        fd = dbus.types.UnixFd(theirs)
+        theirs.close()
+        return fd, dbus.UInt16(mtu)
+
+    def _on_write_ready(self, fd, condition):
+        if condition & GLib.IO_IN:
+            try:
+                data = self._write_sock.recv(self._write_mtu)
+            except BlockingIOError:
+                return True
+            except OSError as e:
+                logger.error(f'Failed to receive write: {str(e)}')
+                data = b''
+            if data:
+                self._store_value(data)
+                return True
+
+        # Empty read, HUP or ERR: BlueZ has released the socket
+        self._write_sock.close()
+        self._write_sock = None
+        self._properties[GATT_CHRC_IFACE]['WriteAcquired'] = dbus.Boolean(False)
+        logger.debug('Acquired write released')
+        return False
+
 class SITRCharacteristic(BLECharacteristic):
     """SITR specific characteristic"""
     SITR_CHARACTERISTIC_UUID = '12345678-1234-5678-1234-56789abcdef1'
@@ -162,7 +321,8 @@ class SITRCharacteristic(BLECharacteristic):
             bus, index,
             self.SITR_CHARACTERISTIC_UUID,
             ['read', 'write', 'notify'],
-            service)
+            service,
+            acquire_notify=True)
 
 class SITRService(BLEService):
     """SITR specific service"""
@@ -179,45 +339,81 @@ class Application(dbus.service.Object):
     def __init__(self, bus):
         self.path = f'{BASE_PATH}'
         self.services = []
+        self._managed_objects = None
         super().__init__(bus, self.path)
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return APP_PATH
 
     def add_service(self, service):
         logger.debug('Adding service')
         self.services.append(service)
+        service.application = self
+        self.object_added(service)
+        for char in service.characteristics:
+            self.object_added(char)
         logger.debug('Service added')
 
+    def object_added(self, obj):
+        """Drop the cached object tree and announce obj to ObjectManager clients"""
+        self._managed_objects = None
+        # Let clients track the tree incrementally instead of calling
+        # GetManagedObjects again
+        self.InterfacesAdded(obj.get_path(), obj.get_properties())
+
+    @dbus.service.signal(DBUS_OM_IFACE,
+                        signature='oa{sa{sv}}')
+    def InterfacesAdded(self, object_path, interfaces):
+        """Signal emitted when objects are added to the application"""
+        pass
+
     @dbus.service.method(DBUS_OM_IFACE,
                         out_signature='a{oa{sa{sv}}}')
     def GetManagedObjects(self):
-        response = {}
-        for service in self.services:
-            response[service.get_path()] = service.get_properties()
-            for char in service.characteristics:
-                response[char.get_path()] = char.get_properties()
-        return response
+        # Property dicts are updated in place, so only the set of objects
+        # needs tracking between calls
+        if self._managed_objects is None:
+            response = {}
+            for service in self.services:
+                response[service.get_path()] = service.get_properties()
+                for char in service.characteristics:
+                    response[char.get_path()] = char.get_properties()
+            self._managed_objects = response
+        return self._managed_objects
 
 class Advertisement(dbus.service.Object):
     """BLE Advertisement"""
     
     def __init__(self, bus, index, advertising_type):
         self.path = f'{BASE_PATH}/advertisement{index}'
+        self._object_path = dbus.ObjectPath(self.path)
         self.bus = bus
         self.ad_type = advertising_type
+        self._properties = None
         self.local_name = 'SITR Device'
         super().__init__(bus, self.path)
 
+    @property
+    def local_name(self):
+        return self._local_name
+
+    @local_name.setter
+    def local_name(self, value):
+        self._local_name = value
+        self._properties = None
+
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def get_properties(self):
-        properties = dict()
-        properties['Type'] = self.ad_type
-        if self.local_name:
-            properties['LocalName'] = dbus.String(self.local_name)
-        return {LE_ADVERTISING_MANAGER_IFACE: properties}
+        # BlueZ reads these repeatedly while advertising; wrap them only once
+        if self._properties is None:
+            properties = dict()
+            properties['Type'] = self.ad_type
+            if self.local_name:
+                properties['LocalName'] = dbus.String(self.local_name)
+            self._properties = {LE_ADVERTISING_MANAGER_IFACE: properties}
+        return self._properties
 
     @dbus.service.method(DBUS_PROP_IFACE,
                         in_signature='s',
@@ -229,13 +425,14 @@ class Advertisement(dbus.service.Object):
 
 def find_adapter(bus):
     """Find the Bluetooth adapter"""
-    remote_om = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, '/'),
+    # Interface names are known up front, so skip the Introspect round trips
+    remote_om = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, '/', introspect=False),
                               DBUS_OM_IFACE)
     objects = remote_om.GetManagedObjects()
 
     for path, interfaces in objects.items():
         if GATT_MANAGER_IFACE in interfaces:
-            return bus.get_object(BLUEZ_SERVICE_NAME, path)
+            return bus.get_object(BLUEZ_SERVICE_NAME, path, introspect=False)
 
     raise Exception('Bluetooth adapter not found')
 
@@ -266,23 +463,69 @@ def main():
 
         logger.debug('Registering advertisement...')
         ad_manager.RegisterAdvertisement(
-            advertisement.get_path(), {},
+            advertisement.get_path(), EMPTY_OPTIONS,
             reply_handler=lambda: logger.info('Advertisement registered'),
             error_handler=lambda error: logger.error(f'Failed to register advertisement: {str(error)}'))
 
         logger.debug('Registering application...')
         service_manager.RegisterApplication(
-            app.get_path(), {},
+            app.get_path(), EMPTY_OPTIONS,
             reply_handler=lambda: logger.info('Application registered'),
             error_handler=lambda error: logger.error(f'Failed to register application: {str(error)}'))
 
+        pending_unregister = set()
+
+        def unregister_done(name, error=None):
+            if error is not None:
+                logger.error(f'Failed to unregister {name}: {str(error)}')
+            else:
+                logger.info('%s unregistered', name.capitalize())
+            pending_unregister.discard(name)
+            if not pending_unregister:
+                mainloop.quit()
+
+        def shutdown_timed_out():
+            logger.warning('Timed out waiting for BlueZ to unregister, exiting anyway')
+            mainloop.quit()
+            return False
+
+        def request_shutdown(signum):
+            logger.debug('Received signal %s', signum)
+            if pending_unregister:
+                # Second signal while cleanup is in flight: stop waiting
+                mainloop.quit()
+                return True
+
+            logger.info('Shutting down...')
+            pending_unregister.update(('advertisement', 'application'))
+            # Never let a stalled bluetoothd hold the process past the timeout
+            GLib.timeout_add(SHUTDOWN_TIMEOUT_MS, shutdown_timed_out)
+            # The two unregister calls are independent, so keep both in flight at once
+            ad_manager.UnregisterAdvertisement(
+                advertisement.get_path(),
+                reply_handler=lambda: unregister_done('advertisement'),
+                error_handler=lambda error: unregister_done('advertisement', error))
+            service_manager.UnregisterApplication(
+                app.get_path(),
+                reply_handler=lambda: unregister_done('application'),
+                error_handler=lambda error: unregister_done('application', error))
+            return True
+
+        # Ctrl+C and systemd's SIGTERM both unregister and then quit the loop.
+        # GLib dispatches these from the main loop itself rather than from an
+        # interpreter-level handler. Python's SIGINT handler must be reset
+        # first: while it is still default_int_handler, MainLoop.run()
+        # installs its own fallback that would take SIGINT back from GLib
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            GLib.unix_signal_add(GLib.PRIORITY_HIGH, signum, request_shutdown, signum)
+
         logger.info('GATT server is running. Press Ctrl+C to stop.')
         mainloop.run()
+        logger.info('GATT server stopped')
 
     except KeyboardInterrupt:
-        logger.info('Shutting down...')
-        ad_manager.UnregisterAdvertisement(advertisement.get_path())
-        logger.info('Advertisement unregistered')
+        logger.info('Interrupted during startup')
         sys.exit(0)
     except Exception as e:
         logger.error(f'Fatal error: {str(e)}')
@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
+import filecmp
 import os
 import shutil
 import subprocess
-import time
 from logger_config import logger
 
+def _install_file(src, dst):
+    """Copy src to dst unless dst already has identical contents. Returns True if copied."""
+    if os.path.exists(dst) and filecmp.cmp(src, dst, shallow=False):
+        return False
+    shutil.copy2(src, dst)
+    return True
+
 def install_service():
     """Install the BLE GATT server as a systemd service."""
     try:
@@ -26,8 +33,8 @@ def install_service():
         # Copy files to installation directory
         for file in files_to_copy:
             if os.path.exists(file):
-                shutil.copy2(file, os.path.join(install_dir, file))
-                logger.info(f"Copied {file} to {install_dir}")
+                if _install_file(file, os.path.join(install_dir, file)):
+                    logger.info("Copied %s to %s", file, install_dir)
             else:
                 logger.error(f"Required file {file} not found")
                 return False
@@ -40,8 +47,9 @@ def install_service():
         service_file = 'pigattserver.service'
         systemd_dir = '/etc/systemd/system'
         if os.path.exists(service_file):
-            shutil.copy2(service_file, os.path.join(systemd_dir, service_file))
-            logger.info(f"Installed {service_file} to {systemd_dir}")
+            service_changed = _install_file(service_file, os.path.join(systemd_dir, service_file))
+            if service_changed:
+                logger.info("Installed %s to %s", service_file, systemd_dir)
         else:
             logger.error(f"Required file {service_file} not found")
             return False
@@ -51,30 +59,26 @@ def install_service():
         dbus_conf_dir = '/etc/dbus-1/system.d'
         if os.path.exists(dbus_conf_file):
             os.makedirs(dbus_conf_dir, exist_ok=True)
-            shutil.copy2(dbus_conf_file, os.path.join(dbus_conf_dir, dbus_conf_file))
-            logger.info(f"Installed {dbus_conf_file} to {dbus_conf_dir}")
+            dbus_conf_changed = _install_file(dbus_conf_file, os.path.join(dbus_conf_dir, dbus_conf_file))
+            if dbus_conf_changed:
+                logger.info("Installed %s to %s", dbus_conf_file, dbus_conf_dir)
             
             # Stop the service if it's running
             subprocess.run(['systemctl', 'stop', 'pigattserver'], check=False)
-            time.sleep(2)
             
-            # Reload D-Bus configuration
-            subprocess.run(['systemctl', 'reload', 'dbus'], check=True)
-            logger.info("Reloaded D-Bus configuration")
-            time.sleep(2)
+            # Reload D-Bus configuration only when the policy file was replaced
+            if dbus_conf_changed:
+                subprocess.run(['systemctl', 'reload', 'dbus'], check=True)
+                logger.info("Reloaded D-Bus configuration")
             
-            # Reload systemd daemon
-            subprocess.run(['systemctl', 'daemon-reload'], check=True)
-            logger.info("Reloaded systemd daemon")
-            time.sleep(2)
+            # Reload systemd daemon only when the unit file was replaced
+            if service_changed:
+                subprocess.run(['systemctl', 'daemon-reload'], check=True)
+                logger.info("Reloaded systemd daemon")
             
             # Enable and start the service
-            subprocess.run(['systemctl', 'enable', 'pigattserver'], check=True)
-            logger.info("Enabled pigattserver service")
-            time.sleep(2)
-            
-            subprocess.run(['systemctl', 'start', 'pigattserver'], check=True)
-            logger.info("Started pigattserver service")
+            subprocess.run(['systemctl', 'enable', '--now', 'pigattserver'], check=True)
+            logger.info("Enabled and started pigattserver service")
             
             return True
         else:
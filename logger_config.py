@@ -1,4 +1,7 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 
 def setup_logger():
@@ -6,14 +9,21 @@ def setup_logger():
     logger = logging.getLogger('ble_server')
     logger.setLevel(logging.INFO)
 
-    # Create console handler with formatting
+    # Create console handler with formatting; the logger's level does the
+    # filtering so entry points such as ble_server can raise verbosity
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     console_handler.setFormatter(formatter)
     
+    # Hand records to a background thread so D-Bus handlers never block on stdout
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
     # Add handler to logger
-    logger.addHandler(console_handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
     
     return logger
 
@@ -8,7 +8,7 @@ class MockDBusInterface:
 
     async def set_property(self, name, value):
         self.properties[name] = value
-        logger.info(f"Mock: Set property {name} to {value}")
+        logger.info("Mock: Set property %s to %s", name, value)
         return True
 
     def get_property(self, name):
@@ -26,7 +26,7 @@ class MockMessageBus:
 
     def export(self, path, interface):
         self.objects[path] = interface
-        logger.info(f"Mock: Exported interface at {path}")
+        logger.info("Mock: Exported interface at %s", path)
 
     def get_proxy_object(self, *args):
         return self
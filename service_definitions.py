@@ -1,9 +1,6 @@
-from enum import Enum
-import uuid
 import dbus
 import dbus.service
 from logger_config import logger  # Make sure logger is correctly imported
-from gi.repository import GLib
 
 class ServiceDefinitions:
     """Define BLE service and characteristic UUIDs and properties."""
@@ -50,22 +47,17 @@ class GattCharacteristic(dbus.service.Object):
     """
 
     def __init__(self, bus, index, uuid, properties, service):
-        logger.debug(f"Initializing GATT characteristic with index {index} and UUID {uuid}")
+        logger.debug("Initializing GATT characteristic with index %s and UUID %s", index, uuid)
         self.path = f'{service.path}/char{index}'
+        self._object_path = dbus.ObjectPath(self.path)
         self.uuid = uuid
         self.service = service
         self.flags = properties
         self.notifying = False
-        self.value = dbus.Array([dbus.Byte(0)], signature=dbus.Signature('y'))
+        self.value = dbus.ByteArray(b'\x00')
         self.bus = bus
-
-        super().__init__(bus, self.path)
-        logger.debug(f"GATT characteristic created at path {self.path}")
-
-    def get_properties(self):
-        """Return the characteristic properties dictionary."""
-        logger.debug(f"Getting properties for characteristic at {self.path}")
-        return {
+        # Built once; StartNotify/StopNotify update Notifying in place
+        self._properties = {
             'org.bluez.GattCharacteristic1': {
                 'Service': self.service.get_path(),
                 'UUID': dbus.String(self.uuid),
@@ -74,16 +66,24 @@ class GattCharacteristic(dbus.service.Object):
             }
         }
 
+        super().__init__(bus, self.path)
+        logger.debug("GATT characteristic created at path %s", self.path)
+
+    def get_properties(self):
+        """Return the characteristic properties dictionary."""
+        logger.debug("Getting properties for characteristic at %s", self.path)
+        return self._properties
+
     def get_path(self):
         """Return the D-Bus path of the characteristic."""
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     @dbus.service.method('org.bluez.GattCharacteristic1',
                          in_signature='a{sv}', 
                          out_signature='ay')
     def ReadValue(self, options):
         """Read the characteristic value."""
-        logger.info(f'Reading characteristic value at {self.path}')
+        logger.info('Reading characteristic value at %s', self.path)
         return self.value
 
     @dbus.service.method('org.bluez.GattCharacteristic1',
@@ -91,8 +91,8 @@ class GattCharacteristic(dbus.service.Object):
                          out_signature='')
     def WriteValue(self, value, options):
         """Write the characteristic value."""
-        logger.info(f'Writing characteristic value at {self.path}')
-        self.value = dbus.Array([dbus.Byte(b) for b in value], signature='y')
+        logger.info('Writing characteristic value at %s', self.path)
+        self.value = dbus.ByteArray(value)
 
     @dbus.service.method('org.bluez.GattCharacteristic1',
                          in_signature='', 
@@ -102,7 +102,8 @@ class GattCharacteristic(dbus.service.Object):
         if self.notifying:
             return
         self.notifying = True
-        logger.info(f'Started notifications for {self.path}')
+        self._properties['org.bluez.GattCharacteristic1']['Notifying'] = dbus.Boolean(True)
+        logger.info('Started notifications for %s', self.path)
 
     @dbus.service.method('org.bluez.GattCharacteristic1',
                          in_signature='', 
@@ -112,14 +113,15 @@ class GattCharacteristic(dbus.service.Object):
         if not self.notifying:
             return
         self.notifying = False
-        logger.info(f'Stopped notifications for {self.path}')
+        self._properties['org.bluez.GattCharacteristic1']['Notifying'] = dbus.Boolean(False)
+        logger.info('Stopped notifications for %s', self.path)
 
     @dbus.service.method('org.freedesktop.DBus.Properties',
                          in_signature='s',
                          out_signature='a{sv}')
     def GetAll(self, interface):
         """Get all properties for the specified interface."""
-        logger.debug(f"GetAll called for interface {interface} on characteristic {self.path}")
+        logger.debug("GetAll called for interface %s on characteristic %s", interface, self.path)
         if interface != 'org.bluez.GattCharacteristic1':
             raise dbus.exceptions.DBusException(
                 'org.bluez.Error.InvalidArguments',
@@ -134,52 +136,54 @@ class GattService(dbus.service.Object):
     """
 
     def __init__(self, bus, index, uuid):
-        logger.debug(f"Initializing GATT service with index {index} and UUID {uuid}")
+        logger.debug("Initializing GATT service with index %s and UUID %s", index, uuid)
         self.path = f'/org/bluez/pigattserver/pigattserver{index}'
+        self._object_path = dbus.ObjectPath(self.path)
         self.uuid = uuid
         self.bus = bus
         self.characteristics = []
         self.next_index = 0
-
-        super().__init__(bus, self.path)
-        logger.debug(f"GATT service created at path {self.path}")
-
-    def get_properties(self):
-        """Return the service properties dictionary."""
-        logger.debug(f"Getting properties for GATT service at {self.path}")
-        return {
+        # Immutable snapshot handed to callers; the property array stays private
+        self._characteristic_paths = ()
+        # Built once; add_characteristic appends to the cached path array
+        self._properties = {
             'org.bluez.GattService1': {
                 'UUID': dbus.String(self.uuid),
                 'Primary': dbus.Boolean(True),
-                'Characteristics': dbus.Array(
-                    self.get_characteristic_paths(),
-                    signature='o'
-                )
+                'Characteristics': dbus.Array([], signature='o')
             }
         }
 
+        super().__init__(bus, self.path)
+        logger.debug("GATT service created at path %s", self.path)
+
+    def get_properties(self):
+        """Return the service properties dictionary."""
+        logger.debug("Getting properties for GATT service at %s", self.path)
+        return self._properties
+
     def get_path(self):
         """Return the D-Bus path of the service."""
-        return dbus.ObjectPath(self.path)
+        return self._object_path
 
     def add_characteristic(self, characteristic):
         """Add a characteristic to this service."""
         self.characteristics.append(characteristic)
-        logger.debug(f"Added characteristic to service at {self.path}: {characteristic.get_path()}")
+        self._properties['org.bluez.GattService1']['Characteristics'].append(
+            characteristic.get_path())
+        self._characteristic_paths += (characteristic.get_path(),)
+        logger.debug("Added characteristic to service at %s: %s", self.path, characteristic.get_path())
 
     def get_characteristic_paths(self):
         """Get the D-Bus paths of all characteristics."""
-        result = []
-        for chrc in self.characteristics:
-            result.append(chrc.get_path())
-        return result
+        return self._characteristic_paths
 
     @dbus.service.method('org.freedesktop.DBus.Properties',
                          in_signature='s',
                          out_signature='a{sv}')
     def GetAll(self, interface):
         """Get all properties for the specified interface."""
-        logger.debug(f"GetAll called for interface {interface} on service {self.path}")
+        logger.debug("GetAll called for interface %s on service %s", interface, self.path)
         if interface != 'org.bluez.GattService1':
             raise dbus.exceptions.DBusException(
                 'org.bluez.Error.InvalidArguments',
@@ -1,7 +1,33 @@
+import filecmp
 import os
+import shutil
 import subprocess
 from logger_config import logger
 
+BLUEZ_CONFIG_SOURCE = 'bluez-config.conf'
+BLUEZ_CONFIG_PATH = '/etc/bluetooth/main.conf'
+
+# Cannot change while the process is running
+_IS_REPLIT = "REPL_ID" in os.environ
+
+# Setup steps run in one shell; each step exits with its own status so the
+# caller can tell which one failed. The group change does not depend on the
+# config, so it runs in the background while Bluetooth restarts
+_RESTART_SCRIPT = 'systemctl restart bluetooth || exit 2\n'
+_GROUP_START_SCRIPT = 'usermod -a -G bluetooth "$USER" & group_pid=$!\n'
+_GROUP_WAIT_SCRIPT = 'wait "$group_pid" || exit 3\n'
+_STEP_ERRORS = {
+    2: "Failed to restart Bluetooth service",
+    3: "Failed to add user to bluetooth group",
+}
+
+def _bluez_config_current():
+    """Return True when the installed BlueZ configuration already matches ours."""
+    try:
+        return filecmp.cmp(BLUEZ_CONFIG_SOURCE, BLUEZ_CONFIG_PATH, shallow=False)
+    except OSError:
+        return False
+
 def setup_bluetooth_permissions():
     """
     Setup BlueZ permissions and configuration for the GATT server.
@@ -9,41 +35,57 @@ def setup_bluetooth_permissions():
     """
     try:
         # Check if running in development mode
-        if "REPL_ID" in os.environ:
+        if _IS_REPLIT:
             logger.info("Development mode: Simulating Bluetooth setup")
             logger.info("Note: Actual setup will be performed on Raspberry Pi hardware")
             return True
 
-        # Check if running with sufficient privileges
-        if os.geteuid() != 0:
-            logger.error("This script needs to be run with sudo privileges")
-            return False
-
-        # Copy BlueZ configuration
-        try:
-            subprocess.run(['cp', 'bluez-config.conf', '/etc/bluetooth/main.conf'], check=True)
-            logger.info("BlueZ configuration updated successfully")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to update BlueZ configuration: {str(e)}")
-            return False
-
-        # Restart Bluetooth service
-        try:
-            subprocess.run(['systemctl', 'restart', 'bluetooth'], check=True)
+        # Copy BlueZ configuration unless nothing changed
+        update_config = not _bluez_config_current()
+        if update_config:
+            # Check that we can write the configuration, whether through root
+            # or granted capabilities; effective_ids makes access() honour them
+            target = BLUEZ_CONFIG_PATH
+            if not os.path.exists(target):
+                target = os.path.dirname(BLUEZ_CONFIG_PATH)
+            if not os.access(target, os.W_OK, effective_ids=True):
+                logger.error("This script needs write access to %s (run with sudo)", target)
+                return False
+
+            try:
+                shutil.copyfile(BLUEZ_CONFIG_SOURCE, BLUEZ_CONFIG_PATH)
+                os.chmod(BLUEZ_CONFIG_PATH, 0o644)
+                logger.info("BlueZ configuration updated successfully")
+            except OSError as e:
+                logger.error(f"Failed to update BlueZ configuration: {str(e)}")
+                return False
+        else:
+            logger.info("BlueZ configuration already up to date")
+
+        # Restart Bluetooth for the new configuration and add the current
+        # user to the bluetooth group
+        username = os.environ.get('USER', os.environ.get('USERNAME'))
+        script = ''
+        if username:
+            script += _GROUP_START_SCRIPT
+        if update_config:
+            script += _RESTART_SCRIPT
+        if username:
+            script += _GROUP_WAIT_SCRIPT
+        if script:
+            env = dict(os.environ, USER=username or '')
+            try:
+                subprocess.run(['sh', '-c', script], env=env, check=True,
+                               capture_output=True, text=True)
+            except subprocess.CalledProcessError as e:
+                message = _STEP_ERRORS.get(e.returncode, "Bluetooth setup failed")
+                logger.error(f"{message}: {e.stderr.strip()}")
+                return False
+
+        if update_config:
             logger.info("Bluetooth service restarted successfully")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to restart Bluetooth service: {str(e)}")
-            return False
-
-        # Add current user to bluetooth group
-        try:
-            username = os.environ.get('USER', os.environ.get('USERNAME'))
-            if username:
-                subprocess.run(['usermod', '-a', '-G', 'bluetooth', username], check=True)
-                logger.info(f"Added user {username} to bluetooth group")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to add user to bluetooth group: {str(e)}")
-            return False
+        if username:
+            logger.info("Added user %s to bluetooth group", username)
 
         logger.info("Bluetooth permissions and configuration setup completed successfully")
         return True
@@ -1,19 +1,44 @@
-import platform
-import subprocess
 import os
+import sys
+import time
 from logger_config import logger
 from setup_bluetooth import setup_bluetooth_permissions
 
-def check_bluetooth_status():
-    """Check if Bluetooth is available and enabled."""
+# Neither can change while the process is running
+_IS_LINUX = sys.platform.startswith("linux")
+_IS_REPLIT = "REPL_ID" in os.environ
+
+# (monotonic timestamp, result) of the last full status check
+_status_cache = None
+
+# Private system bus connection for the bluetoothd probe, created on first use
+_probe_bus = None
+
+def check_bluetooth_status(ttl_ms=0):
+    """Check if Bluetooth is available and enabled.
+
+    Polling callers can pass ttl_ms to reuse a result younger than that many
+    milliseconds instead of re-running the checks.
+    """
+    global _status_cache
+    if (ttl_ms > 0 and _status_cache is not None
+            and time.monotonic() - _status_cache[0] < ttl_ms / 1000):
+        return _status_cache[1]
+
+    result = _check_bluetooth_status()
+    # Stamp after the check, which can include a Bluetooth restart
+    _status_cache = (time.monotonic(), result)
+    return result
+
+def _check_bluetooth_status():
+    global _probe_bus
     try:
-        if platform.system() != "Linux":
+        if not _IS_LINUX:
             logger.error("This application is designed to run on Linux/Raspberry Pi")
             return False
             
         # Check if we're running on Replit (development environment)
-        is_replit = "REPL_ID" in os.environ
-        if is_replit:
+        if _IS_REPLIT:
             logger.info("Running in Replit environment - Bluetooth checks are simulated")
             logger.info("Note: Full Bluetooth functionality requires Raspberry Pi hardware")
             return True
@@ -23,25 +48,33 @@ def check_bluetooth_status():
             logger.error("Failed to setup Bluetooth permissions")
             return False
             
-        # On actual Raspberry Pi, check if Bluetooth service is running
-        result = subprocess.run(['systemctl', 'is-active', 'bluetooth'], 
-                              capture_output=True, text=True)
-        
-        if result.stdout.strip() != "active":
+        # On actual Raspberry Pi, check if bluetoothd owns its bus name.
+        # dbus is imported here so development machines without it can
+        # still import this module. The connection is private so it can never
+        # alias the shared bus the GATT server exports its objects on
+        import dbus
+        if _probe_bus is None:
+            _probe_bus = dbus.SystemBus(private=True)
+        if not _probe_bus.name_has_owner('org.bluez'):
             logger.error("Bluetooth service is not running")
             return False
             
         return True
         
     except Exception as e:
-        if "REPL_ID" in os.environ:
+        if _IS_REPLIT:
             logger.info("Development environment detected - proceeding with simulated Bluetooth")
             return True
         logger.error(f"Error checking Bluetooth status: {str(e)}")
         return False
 
+_ACCEPTED_VALUE_TYPES = (bytes, bytearray)
+
 def validate_characteristic_value(value):
     """Validate characteristic value before updating."""
-    if not isinstance(value, (bytes, bytearray)):
+    # Plain bytes is by far the common case; skip the isinstance walk for it
+    if type(value) is bytes:
+        return True
+    if not isinstance(value, _ACCEPTED_VALUE_TYPES):
         raise ValueError("Characteristic value must be bytes or bytearray")
     return True